@@ -5,9 +5,9 @@
 # Etapas:
 # 1. Preparação
 # 2. Carregamento e inspeção inicial
-# 3. Processamento geoespacial
-# 4. Agregação e exportação (Bronze)
-# 5. Integração socioeconômica e exportação (Silver)
+# 3. Processamento geoespacial e agregação (Bronze)
+# 4. Integração socioeconômica (Silver)
+# 5. Execução e exportação
 # 6. Análise exploratória (Correlação e PCA)
 # 7. Visualizações
 
@@ -18,6 +18,9 @@
 # %%
 import geopandas as gpd
 import pandas as pd
+import numpy as np
+import shapely
+import pyproj
 import os
 import seaborn as sns
 import matplotlib.pyplot as plt
@@ -30,95 +33,160 @@ plt.rcParams["figure.figsize"] = (10, 6)
 
 # %% [markdown]
 # ## 2. Carregamento e inspeção inicial
-# Carrega shapefiles e valida existência de dados.
+# Carrega shapefiles (com cache GeoParquet) e valida existência de dados.
 
 # %%
 # Definição de caminhos
 caminho_desmat = "data/raw/yearly_deforestation_biome/yearly_deforestation_biome.shp"
 caminho_mun = "data/raw/PA_Municipios_2024/PA_Municipios_2024.shp"
+cache = "data/cache"
+
+
+def ler_com_cache(caminho_shp, caminho_parquet):
+    """Lê o shapefile uma vez e reutiliza a cópia GeoParquet nas execuções seguintes."""
+    # Considera o .shp e seus arquivos auxiliares (atributos ficam no .dbf)
+    base = os.path.splitext(caminho_shp)[0]
+    fontes = [f"{base}{ext}" for ext in ('.shp', '.shx', '.dbf', '.prj', '.cpg')]
+    fontes = [f for f in fontes if os.path.exists(f)]
+    if os.path.exists(caminho_parquet) and all(
+        os.path.getmtime(caminho_parquet) >= os.path.getmtime(f) for f in fontes
+    ):
+        return gpd.read_parquet(caminho_parquet)
+    gdf = gpd.read_file(caminho_shp)
+
+    # Escrita do cache é opcional: uma falha aqui não descarta o shapefile já lido
+    try:
+        os.makedirs(os.path.dirname(caminho_parquet), exist_ok=True)
+        gdf.to_parquet(caminho_parquet, compression='zstd')
+    except Exception as e:
+        print(f"Aviso: não foi possível gravar o cache {caminho_parquet}: {e}")
+    return gdf
+
 
 # Leitura com fallback
 try:
-    gdf_desmat = gpd.read_file(caminho_desmat)
-    gdf_mun = gpd.read_file(caminho_mun)
+    gdf_desmat = ler_com_cache(caminho_desmat, f"{cache}/desmat.parquet")
+    gdf_mun = ler_com_cache(caminho_mun, f"{cache}/municipios.parquet")
 except Exception as e:
     print(f"Erro ao carregar shapefiles: {e}")
     gdf_desmat, gdf_mun = gpd.GeoDataFrame(), gpd.GeoDataFrame()
 
 # %% [markdown]
-# ## 3. Processamento geoespacial
-# Filtra Pará, harmoniza CRS e calcula interseções.
-
-# %%
-# Filtro apenas Pará
-if 'state' in gdf_desmat.columns:
-    gdf_desmat = gdf_desmat[gdf_desmat['state'] == "PA"]
-
-# Ajuste de CRS
-if not gdf_desmat.empty and not gdf_mun.empty and gdf_desmat.crs != gdf_mun.crs:
-    gdf_mun = gdf_mun.to_crs(gdf_desmat.crs)
-
-# Campos essenciais
-if 'uuid' in gdf_desmat.columns:
-    gdf_desmat = gdf_desmat.rename(columns={'uuid': 'id_desmat'})
-gdf_desmat = gdf_desmat[['id_desmat', 'year', 'area_km', 'geometry']]
-gdf_mun = gdf_mun[['CD_MUN', 'NM_MUN', 'geometry']]
-
-# Correção de geometrias
-gdf_desmat['geometry'] = gdf_desmat.geometry.buffer(0)
-gdf_mun['geometry'] = gdf_mun.geometry.buffer(0)
-
-# Interseção e cálculo de área (km²)
-gdf_inter = gpd.overlay(gdf_desmat, gdf_mun, how='intersection')
-gdf_inter['area_km2'] = gdf_inter.to_crs('EPSG:5880').area / 1e6
-
-# %% [markdown]
-# ## 4. Agregação e exportação (Bronze)
-# Soma áreas por município e ano, gera CSV intermediário.
+# ## 3. Processamento geoespacial e agregação (Bronze)
+# Filtra Pará, harmoniza CRS, calcula interseções e soma áreas por município e ano.
 
 # %%
-# Agrupar e pivotar
-
-df_ano = (
-    gdf_inter
-    .groupby(['CD_MUN', 'NM_MUN', 'year'])['area_km2']
-    .sum()
-    .reset_index()
-)
-df_pivot = (
-    df_ano
-    .pivot_table(
-        index=['CD_MUN', 'NM_MUN'],
-        columns='year',
-        values='area_km2',
-        fill_value=0
+def build_bronze(gdf_desmat, gdf_mun):
+    """Desmatamento (km²) por município e ano, com coluna total_km2."""
+    # Filtro apenas Pará
+    if 'state' in gdf_desmat.columns:
+        gdf_desmat = gdf_desmat[gdf_desmat['state'] == "PA"]
+
+    if not gdf_desmat.empty and not gdf_mun.empty:
+        # Recorte grosseiro pelo retângulo envolvente dos municípios, antes de reprojetar
+        transformer = pyproj.Transformer.from_crs(gdf_mun.crs, gdf_desmat.crs, always_xy=True)
+        minx, miny, maxx, maxy = transformer.transform_bounds(*gdf_mun.total_bounds)
+        gdf_desmat = gdf_desmat.cx[minx:maxx, miny:maxy]
+
+        # Ajuste de CRS: projeta ambos uma única vez para o CRS métrico (SIRGAS 2000 / Brazil Polyconic)
+        gdf_desmat = gdf_desmat.to_crs('EPSG:5880')
+        gdf_mun = gdf_mun.to_crs('EPSG:5880')
+
+    # Campos essenciais
+    if 'uuid' in gdf_desmat.columns:
+        gdf_desmat = gdf_desmat.rename(columns={'uuid': 'id_desmat'})
+    gdf_desmat = gdf_desmat[['id_desmat', 'year', 'area_km', 'geometry']]
+    gdf_mun = gdf_mun[['CD_MUN', 'NM_MUN', 'geometry']]
+
+    # Correção de geometrias: buffer(0) vetorizado (make_valid manteria os dois lóbulos de anéis auto-intersectantes)
+    gdf_desmat['geometry'] = shapely.buffer(gdf_desmat.geometry.to_numpy(), 0)
+    gdf_mun['geometry'] = shapely.buffer(gdf_mun.geometry.to_numpy(), 0)
+
+    # Interseção vetorizada: STRtree dos municípios consultado em lote
+    geoms_desmat = gdf_desmat.geometry.to_numpy()
+    geoms_mun = gdf_mun.geometry.to_numpy()
+    tree = shapely.STRtree(geoms_mun)
+    idx_desmat, idx_mun = tree.query(geoms_desmat, predicate='intersects')
+    geoms_inter = shapely.intersection(geoms_desmat[idx_desmat], geoms_mun[idx_mun])
+
+    # Mantém apenas interseções com área (descarta contatos de borda)
+    mask = ~shapely.is_empty(geoms_inter) & (shapely.get_dimensions(geoms_inter) == 2)
+    idx_desmat, idx_mun = idx_desmat[mask], idx_mun[mask]
+    gdf_inter = gpd.GeoDataFrame(
+        {
+            'id_desmat': gdf_desmat['id_desmat'].to_numpy()[idx_desmat],
+            'year': gdf_desmat['year'].to_numpy()[idx_desmat],
+            'area_km': gdf_desmat['area_km'].to_numpy()[idx_desmat],
+            'CD_MUN': gdf_mun['CD_MUN'].to_numpy()[idx_mun],
+            'NM_MUN': gdf_mun['NM_MUN'].to_numpy()[idx_mun],
+        },
+        geometry=geoms_inter[mask],
+        crs=gdf_desmat.crs,
     )
-    .reset_index()
-)
-anos = [c for c in df_pivot.columns if str(c).isdigit()]
-df_pivot['total_km2'] = df_pivot[anos].sum(axis=1)
 
-# Exportar Bronze
-os.makedirs("data/bronze", exist_ok=True)
-df_pivot.to_csv("data/bronze/desmatamento_municipio_ano.csv", index=False, encoding='utf-8-sig')
+    # Área (km²) direto no CRS métrico
+    gdf_inter['area_km2'] = shapely.area(gdf_inter.geometry.to_numpy()) / 1e6
+
+    # Chaves categóricas: códigos inteiros por hash, sem ordenar as linhas
+    gdf_inter['CD_MUN'] = gdf_inter['CD_MUN'].astype('category')
+    gdf_inter['NM_MUN'] = gdf_inter['NM_MUN'].astype('category')
+    gdf_inter['year'] = gdf_inter['year'].astype('int32')
+
+    # Agrupar e pivotar: soma por (município, ano) numa matriz densa
+    codigos = gdf_inter['CD_MUN'].cat.categories
+    pos_mun = gdf_inter['CD_MUN'].cat.codes.to_numpy(dtype=np.int64)
+    pos_ano, anos = pd.factorize(gdf_inter['year'], sort=True)
+    matriz = np.bincount(
+        pos_mun * len(anos) + pos_ano,
+        weights=gdf_inter['area_km2'].to_numpy(),
+        minlength=len(codigos) * len(anos)
+    ).reshape(len(codigos), len(anos))
+
+    df_pivot = pd.DataFrame(matriz, columns=anos.astype(str).tolist())
+    df_pivot.insert(0, 'CD_MUN', codigos)
+    cod_nome = np.empty(len(codigos), dtype=np.int64)
+    cod_nome[pos_mun] = gdf_inter['NM_MUN'].cat.codes.to_numpy()
+    df_pivot.insert(1, 'NM_MUN', gdf_inter['NM_MUN'].cat.categories[cod_nome])
+    df_pivot['total_km2'] = matriz.sum(axis=1)
+    return df_pivot
 
 # %% [markdown]
-# ## 5. Integração socioeconômica e exportação (Silver)
+# ## 4. Integração socioeconômica (Silver)
 # Une dados bronze com IPS e calcula proporção de desmatamento.
 
 # %%
 bronze = "data/bronze"
 silver = "data/silver"
-os.makedirs(silver, exist_ok=True)
 
-ips = pd.read_csv(f"{bronze}/ips_brasil_municipios.csv", dtype={"Código IBGE": str})
-ips = ips.rename(columns={"Código IBGE": "CD_MUN"})
-desmat = pd.read_csv(f"{bronze}/desmatamento_municipio_ano.csv", dtype={"CD_MUN": str})
 
-df = desmat.merge(ips, on="CD_MUN", how="left")
-df = df.rename(columns={"Área (km²)": "area_municipio_km2"})
-df["desmat_prop"] = df["total_km2"] / df["area_municipio_km2"]
+def build_silver(df_pivot):
+    """Une o Bronze (em memória) ao IPS e calcula a proporção desmatada."""
+    ips = pd.read_csv(
+        f"{bronze}/ips_brasil_municipios.csv",
+        engine='pyarrow',
+        dtype={"Código IBGE": "string[pyarrow]", "Área (km²)": "float64"}
+    )
+    ips = ips.rename(columns={"Código IBGE": "CD_MUN"})
+
+    df = df_pivot.astype({"CD_MUN": str}).merge(ips, on="CD_MUN", how="left")
+    df = df.rename(columns={"Área (km²)": "area_municipio_km2"})
+    df["desmat_prop"] = df["total_km2"] / df["area_municipio_km2"]
+    return df
+
+# %% [markdown]
+# ## 5. Execução e exportação
+# Gera Bronze e Silver em memória e persiste cada camada uma única vez
+# (Parquet, mais CSV para consumidores externos).
+
+# %%
+df_pivot = build_bronze(gdf_desmat, gdf_mun)
+df = build_silver(df_pivot)
 
+os.makedirs(bronze, exist_ok=True)
+os.makedirs(silver, exist_ok=True)
+df_pivot.to_parquet(f"{bronze}/desmatamento_municipio_ano.parquet", index=False, compression='zstd')
+df_pivot.to_csv(f"{bronze}/desmatamento_municipio_ano.csv", index=False, encoding='utf-8-sig')
+df.to_parquet(f"{silver}/municipios_analise.parquet", index=False, compression='zstd')
 df.to_csv(f"{silver}/municipios_analise.csv", index=False, encoding='utf-8-sig')
 
 # %% [markdown]
@@ -134,13 +202,22 @@ cols = [
     "Fundamentos do Bem-estar",
     "Oportunidades"
 ]
-data_norm = (df[cols] - df[cols].min()) / (df[cols].max() - df[cols].min())
+# Normalização min-max num único array (colunas constantes viram NaN, como no pandas)
+A = df[cols].to_numpy(dtype=np.float64)
+amin = np.nanmin(A, axis=0)
+amax = np.nanmax(A, axis=0)
+A -= amin
+with np.errstate(invalid='ignore', divide='ignore'):
+    A /= amax - amin
+data_norm = pd.DataFrame(A, columns=cols, index=df.index)
 corr = data_norm.corr()
 corr.to_csv(f"{silver}/correlacoes_desmatamento_ips.csv", index=True)
 
-# PCA para 2 componentes
-pca = PCA(n_components=2)
-X = StandardScaler().fit_transform(data_norm.dropna())
+# PCA para 2 componentes (float32, padronização in-place, sem cópia do dropna)
+X = data_norm.to_numpy(dtype=np.float32)
+X = X[~np.isnan(X).any(axis=1)]
+X = StandardScaler(copy=False).fit_transform(X)
+pca = PCA(n_components=2, svd_solver='randomized', random_state=0)
 pca_result = pca.fit_transform(X)
 
 # %% [markdown]
@@ -149,7 +226,8 @@ pca_result = pca.fit_transform(X)
 
 # %%
 # Série temporal de desmatamento
-ts_df = df_ano.groupby('year')['area_km2'].sum().reset_index()
+anos = [c for c in df_pivot.columns if c.isdigit()]
+ts_df = pd.DataFrame({'year': [int(a) for a in anos], 'area_km2': df_pivot[anos].sum().to_numpy()})
 sns.lineplot(data=ts_df, x='year', y='area_km2', marker='o')
 plt.title('Desmatamento Anual Total')
 plt.xlabel('Ano')
@@ -1,20 +1,31 @@
+import numpy as np
 import pandas as pd
 import dash
 from dash import html, dcc, dash_table
+from dash.exceptions import PreventUpdate
 import plotly.express as px
 import dash_bootstrap_components as dbc
 import pathlib
-import re
+import itertools
+import functools
+import json
 from scipy.stats import pearsonr
 import plotly.graph_objects as go
+from flask_caching import Cache
+import precompute
 
 
 BASE_PATH = pathlib.Path(__file__).parent
 reference_text = (BASE_PATH / 'referencias.md').read_text(encoding='utf-8')
 
-df = pd.read_csv('data/silver/municipios_analise.csv')
-df = df[df['UF']=='PA']
-df.rename(columns={'desmat_prop': 'Desmatamento Proporcional à Area'}, inplace=True)
+# Tabelas e figuras pré-computadas por precompute.py; usadas só se completas e atualizadas
+use_precomputed = precompute.caches_available()
+if use_precomputed:
+    df = pd.read_parquet(precompute.DASH_CACHE)
+    ts_df = pd.read_parquet(precompute.TS_CACHE)
+    year_stats_df = pd.read_parquet(precompute.YEAR_STATS_CACHE)
+else:
+    df, ts_df, year_stats_df = precompute.build_dash_tables()
 numeric_cols = df.select_dtypes(include='number').columns.tolist()
 
 analysis_cols = [
@@ -32,27 +43,93 @@ if not available_vars:
 
 table_cols = ['Município', 'area_total_desmatada_km2'] + available_vars
 
-year_cols = [c for c in df.columns if re.match(r'^\d{4}\.0$', c)]
-year_cols = sorted(year_cols, key=lambda x: float(x))
-ts = df[year_cols].sum()
-ts_df = pd.DataFrame({'Ano': [int(float(y)) for y in ts.index], 'Desmatado': ts.values})
-
-max_list = []
-for col in year_cols:
-    year = int(float(col))
-    total = ts[col]
-    idx = df[col].idxmax()
-    mun = df.loc[idx, 'Município']
-    val = df.loc[idx, col]
-    max_list.append({'Ano': year, 'Total Desmatado': total, 'Município que mais desmatou': f"{mun} ({val:.2f} km²)"})
-year_stats_df = pd.DataFrame(max_list)
-
 column_units = {
     'PIB per capita 2021': 'R$',
     'area_total_desmatada_km2': 'km²'
 }
 
+
+def fit_trendline(x, y):
+    """Reta de mínimos quadrados em forma fechada; None se x não varia."""
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x, y = x[valid], y[valid]
+    if len(x) < 2 or x.var() == 0:
+        return None
+    slope = ((x - x.mean()) * (y - y.mean())).mean() / x.var()
+    intercept = y.mean() - slope * x.mean()
+    return slope, intercept, x.min(), x.max()
+
+
+# Coeficientes da reta de tendência para todos os pares de variáveis
+analysis_matrix = df[available_vars].to_numpy(dtype=float)
+trendline_coefs = {
+    (x_col, y_col): fit_trendline(analysis_matrix[:, i], analysis_matrix[:, j])
+    for (i, x_col), (j, y_col) in itertools.product(enumerate(available_vars), repeat=2)
+}
+
+
+# Figura de dispersão por par de variáveis, montada na primeira seleção e reaproveitada
+@functools.lru_cache(maxsize=None)
+def build_scatter(x_col, y_col):
+    fig = px.scatter(df, x=x_col, y=y_col)
+    if trendline_coefs[(x_col, y_col)] is not None:
+        slope, intercept, xmin, xmax = trendline_coefs[(x_col, y_col)]
+        fig.add_trace(go.Scatter(
+            x=[xmin, xmax],
+            y=[slope * xmin + intercept, slope * xmax + intercept],
+            mode='lines',
+            line={'color': fig.data[0].marker.color},
+            name='Tendência (OLS)',
+            showlegend=False
+        ))
+    
+    x_title = x_col
+    y_title = y_col
+    if x_col in column_units:
+        x_title += f' ({column_units[x_col]})'
+    if y_col in column_units:
+        y_title += f' ({column_units[y_col]})'
+    fig.update_layout(
+        title=f'{y_col} vs {x_col}',
+        xaxis_title=x_title,
+        yaxis_title=y_title,
+        height=600
+    )
+    
+    r, p = pearsonr(df[x_col], df[y_col])
+    strength = 'forte' if abs(r) >= 0.7 else 'moderada' if abs(r) >= 0.3 else 'fraca'
+    direction = 'positiva' if r >= 0 else 'negativa'
+    significance = 'estatisticamente significativa' if p < 0.05 else 'não estatisticamente significativa'
+    note = (
+        f"Coeficiente de correlação de {r:.2f} (p-valor = {p:.3f}), "
+        f"sugerindo {strength} correlação {direction}, {significance} (α=0.05)."
+    )
+    return fig.to_dict(), note
+
+
+# Matriz de correlação calculada uma única vez (float32, linhas completas)
+corr_buf = df[available_vars].to_numpy(dtype=np.float32, copy=True)
+corr_buf = corr_buf[~np.isnan(corr_buf).any(axis=1)]
+with np.errstate(invalid='ignore', divide='ignore'):
+    CORR_MATRIX = pd.DataFrame(np.corrcoef(corr_buf, rowvar=False), index=available_vars, columns=available_vars)
+
+# Scatterplots estáticos por indicador, do mesmo conjunto de caches das tabelas
+if use_precomputed:
+    static_figures = json.loads(precompute.STATIC_FIGURES_CACHE.read_text(encoding='utf-8'))
+else:
+    static_figures = precompute.build_static_figures(df, analysis_cols[1:])
+
+STATIC_CARDS = [
+    dbc.Card([
+        dbc.CardHeader(var),
+        dbc.CardBody(dcc.Graph(figure=static_figures[var]))
+    ], className='mb-4')
+    for var in analysis_cols[1:]
+]
+
 app = dash.Dash(__name__, external_stylesheets=[dbc.themes.LITERA], suppress_callback_exceptions=True)
+# Cache em memória por processo: um reinício sempre reflete dados e código atuais
+cache = Cache(app.server, config={'CACHE_TYPE': 'SimpleCache'})
 app.layout = dbc.Container([
     html.H1('Desmatamento e Índices Socioeconômicos no Pará', className='text-center my-4'),
     dbc.Tabs([
@@ -67,6 +144,7 @@ app.layout = dbc.Container([
     dash.dependencies.Output('tab-content', 'children'),
     [dash.dependencies.Input('tabs', 'active_tab')]
 )
+@cache.memoize(timeout=3600)
 def render_tab(active_tab):
     if active_tab == 'tab-dados':
         
@@ -169,22 +247,6 @@ Além disso, o PIB per capta (coletado em 2021) foi analisado para cada municíp
             ))
         ], className='mb-4')
 
-        # Scatterplots estáticos por indicador
-        static_cards = []
-        for var in analysis_cols[1:]:
-            fig_static = px.scatter(df, x=var, y='Desmatamento Proporcional à Area')
-            r_stat, _ = pearsonr(df[var], df['Desmatamento Proporcional à Area'])
-            fig_static.update_layout(
-                title=f"{var} vs Desmatamento Proporcional (r={r_stat:.2f})",
-                height=400
-            )
-            static_cards.append(
-                dbc.Card([
-                    dbc.CardHeader(var),
-                    dbc.CardBody(dcc.Graph(figure=fig_static))
-                ], className='mb-4')
-            )
-
         # Retorna combinação de componentes
         return [
             tseries_card,
@@ -192,17 +254,16 @@ Além disso, o PIB per capta (coletado em 2021) foi analisado para cada municíp
                 dbc.Col([selection_card, corr_toast, info_card], width=4),
                 dbc.Col(scatter_card, width=8)
             ], className='mb-4'),
-            *static_cards
+            *STATIC_CARDS
         ]
     elif active_tab == 'tab-correlacao':
         
-        corr_matrix = df[available_vars].corr()
         heatmap_card = dbc.Card([
             dbc.CardHeader('Mapa de Calor de Correlação'),
             dbc.CardBody(dcc.Graph(
                 id='heatmap',
                 figure=px.imshow(
-                    corr_matrix,
+                    CORR_MATRIX,
                     text_auto='.2f',
                     color_continuous_scale='RdBu',
                     zmin=-1,
@@ -223,10 +284,7 @@ No ano de 2024, o Brasil apresentou a pontuação 68,90 no IPS Global, ocupando
         ], className='mb-4')
         
         mean_vars = [c for c in available_vars if c not in ['PIB per capita 2021', 'Desmatamento Proporcional à Area']]
-        means_df = pd.DataFrame({
-            'Variável': mean_vars,
-            'Média': [df[col].mean() for col in mean_vars]
-        })
+        means_df = df[mean_vars].mean().rename_axis('Variável').reset_index(name='Média')
         
         fig_means = px.bar(
             means_df,
@@ -266,30 +324,9 @@ No ano de 2024, o Brasil apresentou a pontuação 68,90 no IPS Global, ocupando
      dash.dependencies.Input('y-dropdown', 'value')]
 )
 def update_scatter(x_col, y_col):
-    fig = px.scatter(df, x=x_col, y=y_col, trendline='ols')
-    
-    x_title = x_col
-    y_title = y_col
-    if x_col in column_units:
-        x_title += f' ({column_units[x_col]})'
-    if y_col in column_units:
-        y_title += f' ({column_units[y_col]})'
-    fig.update_layout(
-        title=f'{y_col} vs {x_col}',
-        xaxis_title=x_title,
-        yaxis_title=y_title,
-        height=600
-    )
-    
-    r, p = pearsonr(df[x_col], df[y_col])
-    strength = 'forte' if abs(r) >= 0.7 else 'moderada' if abs(r) >= 0.3 else 'fraca'
-    direction = 'positiva' if r >= 0 else 'negativa'
-    significance = 'estatisticamente significativa' if p < 0.05 else 'não estatisticamente significativa'
-    note = (
-        f"Coeficiente de correlação de {r:.2f} (p-valor = {p:.3f}), "
-        f"sugerindo {strength} correlação {direction}, {significance} (α=0.05)."
-    )
-    return fig, note
+    if x_col not in available_vars or y_col not in available_vars:
+        raise PreventUpdate
+    return build_scatter(x_col, y_col)
 
 if __name__ == '__main__':
     app.run(debug=False)
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import plotly.express as px
+import pathlib
+import re
+import json
+from scipy.stats import pearsonr
+
+
+BASE_PATH = pathlib.Path(__file__).parent
+SILVER_PATH = BASE_PATH / 'data' / 'silver'
+
+SOURCE_CSV = SILVER_PATH / 'municipios_analise.csv'
+DASH_CACHE = SILVER_PATH / 'dash_cache.parquet'
+TS_CACHE = SILVER_PATH / 'ts.parquet'
+YEAR_STATS_CACHE = SILVER_PATH / 'year_stats.parquet'
+STATIC_FIGURES_CACHE = SILVER_PATH / 'static_figures.json'
+CACHE_FILES = (DASH_CACHE, TS_CACHE, YEAR_STATS_CACHE, STATIC_FIGURES_CACHE)
+
+TARGET_COL = 'Desmatamento Proporcional à Area'
+STATIC_VARS = [
+    "PIB per capita 2021",
+    "Índice de Progresso Social",
+    "Necessidades Humanas Básicas",
+    "Fundamentos do Bem-estar",
+    "Oportunidades"
+]
+
+
+def build_dash_tables(source=SOURCE_CSV):
+    """Monta as tabelas consumidas pelo dashboard a partir do CSV Silver."""
+    df = pd.read_csv(
+        source,
+        engine='pyarrow',
+        dtype={'CD_MUN': 'string[pyarrow]', 'UF': 'string[pyarrow]', 'Município': 'string[pyarrow]'}
+    )
+    df = df[df['UF']=='PA']
+    df = df.rename(columns={'desmat_prop': 'Desmatamento Proporcional à Area'})
+
+    year_cols = [c for c in df.columns if re.match(r'^\d{4}(\.0)?$', c)]
+    year_cols = sorted(year_cols, key=lambda x: float(x))
+    years = np.array([int(float(c)) for c in year_cols])
+
+    # Bloco denso (municípios x anos) em float32 C-contíguo; somas acumulam em float64
+    year_matrix = np.ascontiguousarray(df[year_cols].to_numpy(dtype=np.float32))
+    totals = np.nansum(year_matrix, axis=0, dtype=np.float64)
+    ts_df = pd.DataFrame({'Ano': years, 'Desmatado': totals})
+
+    # Município líder de cada ano num único argmax (NaN nunca vence)
+    leader_rows = np.where(np.isnan(year_matrix), -np.inf, year_matrix).argmax(axis=0)
+    leader_vals = year_matrix[leader_rows, np.arange(len(years))]
+    leader_names = df['Município'].to_numpy()[leader_rows]
+    year_stats_df = pd.DataFrame({
+        'Ano': years,
+        'Total Desmatado': totals,
+        'Município que mais desmatou': [f"{mun} ({val:.2f} km²)" for mun, val in zip(leader_names, leader_vals)]
+    })
+
+    return df, ts_df, year_stats_df
+
+
+def build_static_figure(var, x, y):
+    """Dispersão de um indicador contra o desmatamento proporcional, como JSON."""
+    fig_static = px.scatter(pd.DataFrame({var: x, TARGET_COL: y}), x=var, y=TARGET_COL)
+    r_stat, _ = pearsonr(x, y)
+    fig_static.update_layout(
+        title=f"{var} vs Desmatamento Proporcional (r={r_stat:.2f})",
+        height=400
+    )
+    return var, fig_static.to_json()
+
+
+def build_static_figures(df, variables=STATIC_VARS):
+    """Figuras estáticas por indicador, como dicts prontos para o dcc.Graph."""
+    y = df[TARGET_COL].to_numpy()
+    results = [build_static_figure(var, df[var].to_numpy(), y) for var in variables]
+    return {var: json.loads(fig_json) for var, fig_json in results}
+
+
+def caches_available():
+    """True se todos os arquivos gerados por main() existem e não são mais antigos que o CSV Silver."""
+    if not all(p.exists() for p in CACHE_FILES):
+        return False
+    if not SOURCE_CSV.exists():
+        return True
+    return min(p.stat().st_mtime for p in CACHE_FILES) >= SOURCE_CSV.stat().st_mtime
+
+
+def main():
+    df, ts_df, year_stats_df = build_dash_tables()
+    STATIC_FIGURES_CACHE.write_text(json.dumps(build_static_figures(df)), encoding='utf-8')
+    df.to_parquet(DASH_CACHE, index=False)
+    ts_df.to_parquet(TS_CACHE, index=False)
+    year_stats_df.to_parquet(YEAR_STATS_CACHE, index=False)
+
+
+if __name__ == '__main__':
+    main()